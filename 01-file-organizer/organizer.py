@@ -4,17 +4,30 @@ Automatically organize files in a directory by type, date, or custom rules
 """
 
 import os
+import sys
 import shutil
+import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from datetime import datetime
 import json
 
+UNDO_FILENAME = '.file_organizer_undo.jsonl'
+
 class FileOrganizer:
-    def __init__(self, directory, dry_run=False):
+    def __init__(self, directory, dry_run=False, max_concurrency=None, quiet=False):
         self.directory = Path(directory)
         self.dry_run = dry_run
-        self.operations = []
+        self.max_concurrency = max_concurrency
+        self.quiet = quiet
+        # Planned moves as parallel lists (source, destination, category)
+        self.op_src = []
+        self.op_dst = []
+        self.op_cat = []
+        self._name_counters = {}
+        # Names present in each destination folder, listed once per folder
+        self._folder_names = {}
+        self._name_key = None
         
         # File type categories
         self.categories = {
@@ -26,6 +39,13 @@ class FileOrganizer:
             'Code': ['.py', '.js', '.html', '.css', '.java', '.cpp', '.c', '.h', '.json', '.xml', '.sql'],
             'Executables': ['.exe', '.msi', '.app', '.deb', '.rpm'],
         }
+        
+        # Reverse lookup so each file costs a single dict access
+        self._ext_to_category = {
+            ext: category
+            for category, extensions in self.categories.items()
+            for ext in extensions
+        }
     
     def organize_by_type(self):
         """Organize files by their extension type"""
@@ -36,39 +56,33 @@ class FileOrganizer:
         print(f"📂 Organizing files in: {self.directory}")
         print(f"{'🔍 DRY RUN MODE - No files will be moved' if self.dry_run else '✅ Moving files...'}\n")
         
-        files_moved = 0
+        with os.scandir(self.directory) as it:
+            entries = self._visible_files(it)
         
-        for file_path in self.directory.iterdir():
-            if file_path.is_file():
-                category = self._get_category(file_path.suffix.lower())
+        for entry in entries:
+            category = self._get_category(os.path.splitext(entry.name)[1].lower())
+            
+            if category:
+                dest_folder = self.directory / category
+                dest_path = dest_folder / entry.name
                 
-                if category:
-                    dest_folder = self.directory / category
-                    dest_path = dest_folder / file_path.name
-                    
-                    # Handle duplicate names
-                    if dest_path.exists():
-                        dest_path = self._get_unique_path(dest_path)
-                    
-                    self.operations.append({
-                        'source': str(file_path),
-                        'destination': str(dest_path),
-                        'category': category
-                    })
-                    
-                    if not self.dry_run:
-                        dest_folder.mkdir(exist_ok=True)
-                        shutil.move(str(file_path), str(dest_path))
-                    
-                    print(f"  {file_path.name} → {category}/")
-                    files_moved += 1
+                # Handle duplicate names
+                dest_path = self._get_unique_path(dest_path)
+                
+                self.op_src.append(entry.path)
+                self.op_dst.append(str(dest_path))
+                self.op_cat.append(category)
+        
+        self._report_operations()
+        
+        files_moved = len(self.op_src) if self.dry_run else self._execute_moves()
         
         print(f"\n✨ {'Would move' if self.dry_run else 'Moved'} {files_moved} file(s)")
         
         if self.dry_run:
             print("\n💡 Run without --dry-run to actually move files")
         else:
-            self._save_undo_info()
+            print(f"\n💾 Undo info saved. Run with --undo to reverse this operation.")
     
     def organize_by_date(self):
         """Organize files by creation/modification date"""
@@ -79,41 +93,35 @@ class FileOrganizer:
         print(f"📅 Organizing files by date in: {self.directory}")
         print(f"{'🔍 DRY RUN MODE' if self.dry_run else '✅ Moving files...'}\n")
         
-        files_moved = 0
+        with os.scandir(self.directory) as it:
+            entries = self._visible_files(it)
         
-        for file_path in self.directory.iterdir():
-            if file_path.is_file():
-                # Get modification time
-                mtime = datetime.fromtimestamp(file_path.stat().st_mtime)
-                year_month = mtime.strftime('%Y-%m')
-                
-                dest_folder = self.directory / year_month
-                dest_path = dest_folder / file_path.name
-                
-                if dest_path.exists():
-                    dest_path = self._get_unique_path(dest_path)
-                
-                self.operations.append({
-                    'source': str(file_path),
-                    'destination': str(dest_path),
-                    'category': year_month
-                })
-                
-                if not self.dry_run:
-                    dest_folder.mkdir(exist_ok=True)
-                    shutil.move(str(file_path), str(dest_path))
-                
-                print(f"  {file_path.name} → {year_month}/")
-                files_moved += 1
+        for entry in entries:
+            # Get modification time (DirEntry caches the stat result)
+            mtime = time.localtime(entry.stat().st_mtime)
+            year_month = f"{mtime.tm_year:04d}-{mtime.tm_mon:02d}"
+            
+            dest_folder = self.directory / year_month
+            dest_path = dest_folder / entry.name
+            
+            dest_path = self._get_unique_path(dest_path)
+            
+            self.op_src.append(entry.path)
+            self.op_dst.append(str(dest_path))
+            self.op_cat.append(year_month)
+        
+        self._report_operations()
+        
+        files_moved = len(self.op_src) if self.dry_run else self._execute_moves()
         
         print(f"\n✨ {'Would move' if self.dry_run else 'Moved'} {files_moved} file(s)")
         
         if not self.dry_run:
-            self._save_undo_info()
+            print(f"\n💾 Undo info saved. Run with --undo to reverse this operation.")
     
     def undo_last_organization(self):
         """Undo the last organization operation"""
-        undo_file = self.directory / '.file_organizer_undo.json'
+        undo_file = self.directory / UNDO_FILENAME
         
         if not undo_file.exists():
             print("❌ No undo information found!")
@@ -121,23 +129,23 @@ class FileOrganizer:
         
         try:
             with open(undo_file, 'r') as f:
-                operations = json.load(f)
+                operations = [json.loads(line) for line in f]
             
             print(f"↩️  Undoing last organization ({len(operations)} operations)...\n")
             
-            for op in reversed(operations):
-                src = Path(op['destination'])
-                dest = Path(op['source'])
-                
-                if src.exists():
-                    shutil.move(str(src), str(dest))
-                    print(f"  Restored: {src.name}")
+            operations.reverse()
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                restored = list(executor.map(self._restore_file, operations))
             
-            # Remove empty folders
-            for item in self.directory.iterdir():
-                if item.is_dir() and not any(item.iterdir()):
-                    item.rmdir()
-                    print(f"  Removed empty folder: {item.name}")
+            for op, was_restored in zip(operations, restored):
+                if was_restored:
+                    print(f"  Restored: {os.path.basename(op['destination'])}")
+            
+            # Remove folders emptied by the undo
+            for folder in sorted({os.path.dirname(op['destination']) for op in operations}):
+                if os.path.isdir(folder) and self._is_empty(folder):
+                    os.rmdir(folder)
+                    print(f"  Removed empty folder: {os.path.basename(folder)}")
             
             undo_file.unlink()
             print(f"\n✅ Successfully undone last organization!")
@@ -145,29 +153,107 @@ class FileOrganizer:
         except Exception as e:
             print(f"❌ Error during undo: {e}")
     
+    def _restore_file(self, op):
+        """Move a file back to its original location if it is still where we put it"""
+        if not os.path.lexists(op['destination']):
+            return False
+        self._move_file(op['destination'], op['source'])
+        return True
+    
+    def _is_empty(self, folder):
+        """Check whether a folder is empty without listing all of it"""
+        with os.scandir(folder) as it:
+            return next(it, None) is None
+    
+    def _visible_files(self, entries):
+        """Filter scandir entries to regular files, skipping hidden ones like our undo file"""
+        return [
+            entry for entry in entries
+            if not entry.name.startswith('.') and entry.is_file(follow_symlinks=False)
+        ]
+    
+    def _report_operations(self):
+        """Print the planned moves in a single write"""
+        if self.quiet or not self.op_src:
+            return
+        lines = [f"  {os.path.basename(src)} → {cat}/" for src, cat in zip(self.op_src, self.op_cat)]
+        sys.stdout.write('\n'.join(lines) + '\n')
+    
+    def _execute_moves(self):
+        """Create each destination folder once, then perform the planned moves,
+        logging each one to the undo file as it completes"""
+        for folder in {os.path.dirname(dest) for dest in self.op_dst}:
+            os.makedirs(folder, exist_ok=True)
+        
+        files_moved = 0
+        # Destinations are resolved up front, so workers only perform the moves
+        with open(self.directory / UNDO_FILENAME, 'w', buffering=1 << 20) as undo_log, \
+                ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {
+                executor.submit(self._move_file, src, dest): (src, dest)
+                for src, dest in zip(self.op_src, self.op_dst)
+            }
+            for future in as_completed(futures):
+                src, dest = futures[future]
+                try:
+                    future.result()
+                except OSError as e:
+                    print(f"  ❌ Could not move {os.path.basename(src)}: {e}")
+                    continue
+                undo_log.write(json.dumps({'source': src, 'destination': dest}) + '\n')
+                files_moved += 1
+        return files_moved
+    
+    def _move_file(self, source, destination):
+        """Move a file, using a plain rename when both paths share a filesystem"""
+        try:
+            os.rename(source, destination)
+        except OSError:
+            shutil.move(source, destination)
+    
     def _get_category(self, extension):
         """Get category for a file extension"""
-        for category, extensions in self.categories.items():
-            if extension in extensions:
-                return category
-        return 'Others'
+        return self._ext_to_category.get(extension, 'Others')
     
     def _get_unique_path(self, path):
         """Generate a unique path if file already exists"""
-        path = Path(path)
-        counter = 1
-        while path.exists():
-            new_name = f"{path.stem}_{counter}{path.suffix}"
-            path = path.parent / new_name
+        path = os.fspath(path)
+        parent, name = os.path.split(path)
+        taken = self._names_in(parent)
+        stem, suffix = os.path.splitext(name)
+        # Resume numbering where the previous collision on this name left off
+        key = (parent, stem, suffix)
+        counter = self._name_counters.get(key, 1)
+        candidate = name
+        while self._name_key(candidate) in taken:
+            candidate = f"{stem}_{counter}{suffix}"
             counter += 1
-        return path
-    
-    def _save_undo_info(self):
-        """Save operations for undo functionality"""
-        undo_file = self.directory / '.file_organizer_undo.json'
-        with open(undo_file, 'w') as f:
-            json.dump(self.operations, f, indent=2)
-        print(f"\n💾 Undo info saved. Run with --undo to reverse this operation.")
+        # Claim the name so later files planned into this folder avoid it
+        taken.add(self._name_key(candidate))
+        self._name_counters[key] = counter
+        return os.path.join(parent, candidate)
+    
+    def _names_in(self, folder):
+        """Return the set of name keys present in a folder, listing it only once"""
+        names = self._folder_names.get(folder)
+        if names is None:
+            if self._name_key is None:
+                self._name_key = self._detect_name_key()
+            try:
+                with os.scandir(folder) as it:
+                    names = {self._name_key(entry.name) for entry in it}
+            except FileNotFoundError:
+                names = set()
+            self._folder_names[folder] = names
+        return names
+    
+    def _detect_name_key(self):
+        """Compare names case-insensitively if the directory's filesystem is"""
+        path = os.path.abspath(self.directory)
+        swapped = path.swapcase()
+        if swapped != path and not os.path.lexists(swapped):
+            return lambda name: name
+        return str.casefold
 
 
 def main():
@@ -187,10 +273,13 @@ Examples:
     parser.add_argument('--by-date', action='store_true', help='Organize by date')
     parser.add_argument('--dry-run', action='store_true', help='Preview changes without moving files')
     parser.add_argument('--undo', action='store_true', help='Undo last organization')
+    parser.add_argument('--quiet', action='store_true', help='Do not list individual files')
+    parser.add_argument('--max-concurrency', type=int, metavar='N',
+                        help='Maximum number of file moves to run in parallel')
     
     args = parser.parse_args()
     
-    organizer = FileOrganizer(args.directory, args.dry_run)
+    organizer = FileOrganizer(args.directory, args.dry_run, args.max_concurrency, args.quiet)
     
     if args.undo:
         organizer.undo_last_organization()
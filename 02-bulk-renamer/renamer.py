@@ -6,15 +6,29 @@ Rename multiple files at once using patterns, regex, or sequential numbering
 
 import os
 import re
+import sys
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import json
 
+UNDO_FILENAME = '.bulk_renamer_undo.jsonl'
+CASE_TRANSFORMS = {'upper': str.upper, 'lower': str.lower, 'title': str.title}
+
 class BulkRenamer:
-    def __init__(self, directory, dry_run=False):
+    def __init__(self, directory, dry_run=False, max_concurrency=None, quiet=False):
         self.directory = Path(directory)
         self.dry_run = dry_run
-        self.operations = []
+        self.max_concurrency = max_concurrency
+        self.quiet = quiet
+        # Planned renames as parallel lists (old path, new path)
+        self.op_old = []
+        self.op_new = []
+        self._name_counters = {}
+        # (folder, name key) pairs that are taken: everything listed by the
+        # directory scan plus destinations claimed by planned renames
+        self._taken = set()
+        self._name_key = None
     
     def rename_with_pattern(self, pattern, extensions=None, start=1):
         """Rename files with a pattern (e.g., 'photo_{num}')"""
@@ -28,48 +42,49 @@ class BulkRenamer:
         
         # Get files to rename
         files = self._get_files(extensions)
-        files.sort()
+        files.sort(key=lambda entry: entry.name)
         
         counter = start
-        renamed_count = 0
         
-        for file_path in files:
+        # Work on plain strings; the pattern's placeholders are fixed for the whole run
+        dir_str = str(self.directory)
+        has_num = '{num}' in pattern
+        has_ext = '{ext}' in pattern
+        
+        for entry in files:
+            ext = os.path.splitext(entry.name)[1]
+            
             # Replace {num} with counter
-            new_name = pattern.replace('{num}', str(counter).zfill(3))
+            new_name = pattern.replace('{num}', f"{counter:03d}") if has_num else pattern
             
             # Keep the original extension if not in pattern
-            if '{ext}' in new_name:
-                new_name = new_name.replace('{ext}', file_path.suffix)
-            elif not Path(new_name).suffix:
-                new_name = new_name + file_path.suffix
+            if has_ext:
+                new_name = new_name.replace('{ext}', ext)
+            elif not os.path.splitext(new_name)[1]:
+                new_name = new_name + ext
             
-            new_path = self.directory / new_name
+            new_path = os.path.join(dir_str, new_name)
             
             # Skip if same name
-            if file_path == new_path:
+            if entry.path == new_path:
                 continue
             
             # Handle duplicates
-            if new_path.exists():
-                new_path = self._get_unique_path(new_path)
-            
-            self.operations.append({
-                'old': str(file_path),
-                'new': str(new_path)
-            })
+            new_path = self._reserve_path(new_path)
             
-            print(f"  {file_path.name} → {new_path.name}")
-            
-            if not self.dry_run:
-                file_path.rename(new_path)
+            self.op_old.append(entry.path)
+            self.op_new.append(new_path)
             
             counter += 1
-            renamed_count += 1
+        
+        self._report_operations()
+        
+        renamed_count = len(self.op_old) if self.dry_run else self._execute_renames()
         
         print(f"\n✨ {'Would rename' if self.dry_run else 'Renamed'} {renamed_count} file(s)")
         
         if not self.dry_run:
-            self._save_undo_info()
+            print(f"\n💾 Undo info saved. Run with --undo to reverse this operation.")
     
     def rename_with_regex(self, find, replace, extensions=None):
         """Rename files using regex pattern"""
@@ -82,36 +97,7 @@ class BulkRenamer:
         print(f"Replace: {replace}")
         print(f"{'🔍 DRY RUN MODE' if self.dry_run else '✅ Renaming files...'}\n")
         
-        files = self._get_files(extensions)
-        renamed_count = 0
-        
-        for file_path in files:
-            stem = file_path.stem
-            new_stem = re.sub(find, replace, stem)
-            
-            if new_stem != stem:
-                new_name = new_stem + file_path.suffix
-                new_path = self.directory / new_name
-                
-                if new_path.exists():
-                    new_path = self._get_unique_path(new_path)
-                
-                self.operations.append({
-                    'old': str(file_path),
-                    'new': str(new_path)
-                })
-                
-                print(f"  {file_path.name} → {new_path.name}")
-                
-                if not self.dry_run:
-                    file_path.rename(new_path)
-                
-                renamed_count += 1
-        
-        print(f"\n✨ {'Would rename' if self.dry_run else 'Renamed'} {renamed_count} file(s)")
-        
-        if not self.dry_run:
-            self._save_undo_info()
+        self._apply_transforms([self._regex_transform(find, replace)], extensions)
     
     def change_case(self, case_type, extensions=None):
         """Change filename case (upper, lower, title)"""
@@ -119,47 +105,15 @@ class BulkRenamer:
             print(f"❌ Directory '{self.directory}' does not exist!")
             return
         
+        convert = CASE_TRANSFORMS.get(case_type)
+        if convert is None:
+            print(f"❌ Unknown case type '{case_type}'")
+            return
+        
         print(f"🔤 Changing case to {case_type} in: {self.directory}")
         print(f"{'🔍 DRY RUN MODE' if self.dry_run else '✅ Renaming files...'}\n")
         
-        files = self._get_files(extensions)
-        renamed_count = 0
-        
-        for file_path in files:
-            stem = file_path.stem
-            
-            if case_type == 'upper':
-                new_stem = stem.upper()
-            elif case_type == 'lower':
-                new_stem = stem.lower()
-            elif case_type == 'title':
-                new_stem = stem.title()
-            else:
-                continue
-            
-            if new_stem != stem:
-                new_name = new_stem + file_path.suffix
-                new_path = self.directory / new_name
-                
-                if new_path.exists():
-                    new_path = self._get_unique_path(new_path)
-                
-                self.operations.append({
-                    'old': str(file_path),
-                    'new': str(new_path)
-                })
-                
-                print(f"  {file_path.name} → {new_path.name}")
-                
-                if not self.dry_run:
-                    file_path.rename(new_path)
-                
-                renamed_count += 1
-        
-        print(f"\n✨ {'Would rename' if self.dry_run else 'Renamed'} {renamed_count} file(s)")
-        
-        if not self.dry_run:
-            self._save_undo_info()
+        self._apply_transforms([convert], extensions)
     
     def add_prefix_suffix(self, prefix='', suffix='', extensions=None):
         """Add prefix and/or suffix to filenames"""
@@ -174,38 +128,77 @@ class BulkRenamer:
             print(f"Suffix: '{suffix}'")
         print(f"{'🔍 DRY RUN MODE' if self.dry_run else '✅ Renaming files...'}\n")
         
+        self._apply_transforms([lambda stem: f"{prefix}{stem}{suffix}"], extensions)
+    
+    def rename(self, regex=None, case_type=None, prefix='', suffix='', extensions=None):
+        """Apply regex, case and prefix/suffix changes (in that order) in a single pass"""
+        if not self.directory.exists():
+            print(f"❌ Directory '{self.directory}' does not exist!")
+            return
+        
+        transforms = []
+        print(f"📝 Renaming files in: {self.directory}")
+        if regex:
+            find, replace = regex
+            transforms.append(self._regex_transform(find, replace))
+            print(f"Find: {find}")
+            print(f"Replace: {replace}")
+        if case_type:
+            convert = CASE_TRANSFORMS.get(case_type)
+            if convert is None:
+                print(f"❌ Unknown case type '{case_type}'")
+                return
+            transforms.append(convert)
+            print(f"Case: {case_type}")
+        if prefix or suffix:
+            transforms.append(lambda stem: f"{prefix}{stem}{suffix}")
+            if prefix:
+                print(f"Prefix: '{prefix}'")
+            if suffix:
+                print(f"Suffix: '{suffix}'")
+        print(f"{'🔍 DRY RUN MODE' if self.dry_run else '✅ Renaming files...'}\n")
+        
+        self._apply_transforms(transforms, extensions)
+    
+    def _apply_transforms(self, transforms, extensions=None):
+        """Pass each file's stem through the transforms and rename, scanning the directory once"""
         files = self._get_files(extensions)
-        renamed_count = 0
+        dir_str = str(self.directory)
         
-        for file_path in files:
-            stem = file_path.stem
-            new_stem = f"{prefix}{stem}{suffix}"
-            new_name = new_stem + file_path.suffix
-            new_path = self.directory / new_name
-            
-            if new_path.exists():
-                new_path = self._get_unique_path(new_path)
+        for entry in files:
+            stem, ext = os.path.splitext(entry.name)
+            new_stem = stem
+            for transform in transforms:
+                new_stem = transform(new_stem)
             
-            self.operations.append({
-                'old': str(file_path),
-                'new': str(new_path)
-            })
-            
-            print(f"  {file_path.name} → {new_path.name}")
+            # A regex that matches nothing hands back the same str object, so this
+            # equality test short-circuits on identity; case methods always return a
+            # new object, so an `is` check would wrongly treat them as changed
+            if new_stem == stem:
+                continue
             
-            if not self.dry_run:
-                file_path.rename(new_path)
+            new_path = self._reserve_path(os.path.join(dir_str, new_stem + ext))
             
-            renamed_count += 1
+            self.op_old.append(entry.path)
+            self.op_new.append(new_path)
+        
+        self._report_operations()
+        
+        renamed_count = len(self.op_old) if self.dry_run else self._execute_renames()
         
         print(f"\n✨ {'Would rename' if self.dry_run else 'Renamed'} {renamed_count} file(s)")
         
         if not self.dry_run:
-            self._save_undo_info()
+            print(f"\n💾 Undo info saved. Run with --undo to reverse this operation.")
+    
+    def _regex_transform(self, find, replace):
+        """Build a stem transform from a regex find/replace pair"""
+        regex = re.compile(find)
+        return lambda stem: regex.sub(replace, stem)
     
     def undo_last_rename(self):
         """Undo the last rename operation"""
-        undo_file = self.directory / '.bulk_renamer_undo.json'
+        undo_file = self.directory / UNDO_FILENAME
         
         if not undo_file.exists():
             print("❌ No undo information found!")
@@ -213,7 +206,7 @@ class BulkRenamer:
         
         try:
             with open(undo_file, 'r') as f:
-                operations = json.load(f)
+                operations = [json.loads(line) for line in f]
             
             print(f"↩️  Undoing last rename operation ({len(operations)} files)...\n")
             
@@ -232,33 +225,100 @@ class BulkRenamer:
             print(f"❌ Error during undo: {e}")
     
     def _get_files(self, extensions=None):
-        """Get list of files to process"""
+        """Get list of directory entries to process"""
         files = []
-        for file_path in self.directory.iterdir():
-            if file_path.is_file():
+        if self._name_key is None:
+            self._name_key = self._detect_name_key()
+        dir_str = str(self.directory)
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                # Every existing name blocks a rename target, renamed or not
+                self._taken.add((dir_str, self._name_key(entry.name)))
+                # Hidden files (including our undo file) are never renamed
+                if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                    continue
                 if extensions:
-                    if file_path.suffix.lower() in extensions:
-                        files.append(file_path)
+                    if os.path.splitext(entry.name)[1].lower() in extensions:
+                        files.append(entry)
                 else:
-                    files.append(file_path)
+                    files.append(entry)
         return files
     
+    def _report_operations(self):
+        """Print the planned renames in a single write"""
+        if self.quiet or not self.op_old:
+            return
+        basename = os.path.basename
+        lines = [f"  {basename(old)} → {basename(new)}" for old, new in zip(self.op_old, self.op_new)]
+        sys.stdout.write('\n'.join(lines) + '\n')
+    
+    def _execute_renames(self):
+        """Run the planned renames concurrently, logging each one to the undo file as it completes"""
+        renamed = 0
+        # All renames stay inside one directory: resolve it once and rename by
+        # bare name relative to its descriptor (renameat) where supported
+        dir_fd = os.open(self.directory, os.O_RDONLY) if os.rename in os.supports_dir_fd else None
+        try:
+            with open(self.directory / UNDO_FILENAME, 'w', buffering=1 << 20) as undo_log, \
+                    ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                futures = {
+                    executor.submit(self._rename_file, old, new, dir_fd): (old, new)
+                    for old, new in zip(self.op_old, self.op_new)
+                }
+                for future in as_completed(futures):
+                    old, new = futures[future]
+                    try:
+                        future.result()
+                    except OSError as e:
+                        print(f"  ❌ Could not rename {os.path.basename(old)}: {e}")
+                        continue
+                    undo_log.write(json.dumps({'old': old, 'new': new}) + '\n')
+                    renamed += 1
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+        return renamed
+    
+    def _rename_file(self, old, new, dir_fd=None):
+        """Rename a file in the working directory, relative to dir_fd when given"""
+        if dir_fd is None or os.path.dirname(new) != os.path.dirname(old):
+            os.rename(old, new)
+        else:
+            os.rename(os.path.basename(old), os.path.basename(new),
+                      src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+    
+    def _reserve_path(self, path):
+        """Claim a free destination path, accounting for renames not yet executed"""
+        path = self._get_unique_path(path)
+        parent, name = os.path.split(path)
+        self._taken.add((parent, self._name_key(name)))
+        return path
+    
     def _get_unique_path(self, path):
-        """Generate a unique path if file already exists"""
-        path = Path(path)
-        counter = 1
-        while path.exists():
-            new_name = f"{path.stem}_{counter}{path.suffix}"
-            path = path.parent / new_name
+        """Generate a unique path if the name is already taken"""
+        path = os.fspath(path)
+        parent, name = os.path.split(path)
+        stem, suffix = os.path.splitext(name)
+        # Only the working directory was listed; targets elsewhere still hit the disk
+        listed = parent == str(self.directory)
+        # Resume numbering where the previous collision on this name left off
+        key = (parent, stem, suffix)
+        counter = self._name_counters.get(key, 1)
+        candidate = name
+        while ((parent, self._name_key(candidate)) in self._taken
+               or (not listed and os.path.lexists(os.path.join(parent, candidate)))):
+            candidate = f"{stem}_{counter}{suffix}"
             counter += 1
-        return path
+        self._name_counters[key] = counter
+        return os.path.join(parent, candidate)
     
-    def _save_undo_info(self):
-        """Save operations for undo functionality"""
-        undo_file = self.directory / '.bulk_renamer_undo.json'
-        with open(undo_file, 'w') as f:
-            json.dump(self.operations, f, indent=2)
-        print(f"\n💾 Undo info saved. Run with --undo to reverse this operation.")
+    def _detect_name_key(self):
+        """Compare names case-insensitively if the directory's filesystem is"""
+        path = os.path.abspath(self.directory)
+        swapped = path.swapcase()
+        if swapped != path and not os.path.lexists(swapped):
+            return lambda name: name
+        return str.casefold
 
 
 def main():
@@ -271,6 +331,7 @@ Examples:
   python renamer.py ./docs --regex "draft" "final"
   python renamer.py ./files --case lower
   python renamer.py ./images --prefix "IMG_" --ext .jpg
+  python renamer.py ./files --regex " " "_" --case lower --prefix "doc_"
   python renamer.py ./folder --undo
         """
     )
@@ -285,20 +346,28 @@ Examples:
     parser.add_argument('--ext', nargs='+', help='Only process files with these extensions')
     parser.add_argument('--dry-run', action='store_true', help='Preview changes without renaming')
     parser.add_argument('--undo', action='store_true', help='Undo last rename operation')
+    parser.add_argument('--quiet', action='store_true', help='Do not list individual files')
+    parser.add_argument('--max-concurrency', type=int, metavar='N',
+                        help='Maximum number of renames to run in parallel')
     
     args = parser.parse_args()
     
-    renamer = BulkRenamer(args.directory, args.dry_run)
+    renamer = BulkRenamer(args.directory, args.dry_run, args.max_concurrency, args.quiet)
     
-    # Process extensions
+    # Process extensions (lowercased once; suffixes are lowercased before lookup)
     extensions = None
     if args.ext:
-        extensions = [ext if ext.startswith('.') else f'.{ext}' for ext in args.ext]
+        extensions = frozenset(
+            ext.lower() if ext.startswith('.') else f'.{ext.lower()}' for ext in args.ext
+        )
     
     if args.undo:
         renamer.undo_last_rename()
     elif args.pattern:
         renamer.rename_with_pattern(args.pattern, extensions, args.start)
+    elif sum(map(bool, (args.regex, args.case, args.prefix or args.suffix))) > 1:
+        # Several stem changes requested: apply them all in one pass
+        renamer.rename(args.regex, args.case, args.prefix or '', args.suffix or '', extensions)
     elif args.regex:
         renamer.rename_with_regex(args.regex[0], args.regex[1], extensions)
     elif args.case:
@@ -1,76 +1,136 @@
 """
 Duplicate File Finder
-Find and manage duplicate files based on content (MD5/SHA256 hashing)
+Find and manage duplicate files based on content (xxHash/BLAKE3/MD5/SHA256 hashing)
 """
 
 import os
+import sys
 import hashlib
+import mmap
 import argparse
 from pathlib import Path
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import itemgetter
 import shutil
 
+# Files at least this large are hashed straight from a memory map
+MMAP_THRESHOLD = 1 << 20
+# Leading bytes hashed first to rule out same-size files cheaply
+HEAD_SIZE = 4096
+# Work handed to one pool task; small files are batched so per-task overhead
+# does not dominate, while large files still get a task each
+HASH_BATCH_BYTES = 1 << 20
+
 class DuplicateFinder:
-    def __init__(self, directory, recursive=False):
+    def __init__(self, directory, recursive=False, max_concurrency=None):
         self.directory = Path(directory)
         self.recursive = recursive
-        self.duplicates = defaultdict(list)
-        self.hash_algorithm = 'md5'
+        # Hashing overlaps disk reads with digest work; hashlib releases the GIL
+        self.max_concurrency = max_concurrency or min(32, (os.cpu_count() or 1) * 2)
+        self.duplicates = {}
+        # Common file size of each hash group, recorded while hashing
+        self.group_sizes = {}
+        self.hash_algorithm = 'xxh3'
     
-    def find_duplicates(self, algorithm='md5'):
-        """Find duplicate files using file hashing"""
+    def find_duplicates(self, algorithm='xxh3'):
+        """Find duplicate files using file hashing (returns None if the scan could not run)"""
         self.hash_algorithm = algorithm
         
         if not self.directory.exists():
             print(f"❌ Directory '{self.directory}' does not exist!")
             return
         
+        try:
+            self._new_hasher()
+        except ImportError as e:
+            # The fast hashes are optional extras; hashlib's BLAKE2b always works
+            print(f"⚠️  {algorithm.upper()} hashing needs the '{e.name}' package "
+                  f"(pip install {e.name}), using BLAKE2B instead\n")
+            algorithm = self.hash_algorithm = 'blake2b'
+        
         print(f"🔍 Scanning for duplicate files in: {self.directory}")
         print(f"Algorithm: {algorithm.upper()}")
         print(f"{'Recursive: Yes' if self.recursive else 'Recursive: No'}\n")
         
-        # First pass: Group by size (optimization)
-        size_groups = defaultdict(list)
         files = self._get_files()
         
         print(f"📊 Found {len(files)} file(s) to analyze...")
         
-        for file_path in files:
-            try:
-                size = file_path.stat().st_size
-                size_groups[size].append(file_path)
-            except Exception as e:
-                print(f"⚠️  Error accessing {file_path}: {e}")
+        # First pass: Group by size (optimization); the sort is stable, so files
+        # of one size keep their walk order and the kept copy does not change
+        files.sort(key=itemgetter(1))
         
         # Second pass: Hash files with same size
         print("\n🔐 Computing file hashes...")
         hash_dict = {}
         processed = 0
         
-        for size, file_list in size_groups.items():
-            if len(file_list) > 1:  # Only hash if multiple files have same size
-                for file_path in file_list:
-                    try:
-                        file_hash = self._hash_file(file_path)
-                        
-                        if file_hash in hash_dict:
-                            self.duplicates[file_hash].append(file_path)
-                            if len(self.duplicates[file_hash]) == 1:
-                                self.duplicates[file_hash].insert(0, hash_dict[file_hash])
+        # Only hash if multiple files have same size
+        candidates = []
+        for size, group in groupby(files, key=itemgetter(1)):
+            group = list(group)
+            if len(group) > 1:
+                candidates.extend((Path(file_path), size) for file_path, file_size in group)
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            head_futures = [
+                (batch, executor.submit(self._hash_batch, self._hash_head,
+                                        [(file_path,) for file_path, size in batch]))
+                for batch in self._batches(candidates, lambda item: HEAD_SIZE)
+            ]
+            
+            # Files whose first block differs cannot be duplicates
+            head_groups = {}
+            for batch, future in head_futures:
+                for (file_path, size), head in zip(batch, future.result()):
+                    if isinstance(head, Exception):
+                        print(f"\n⚠️  Error hashing {file_path}: {head}")
+                    else:
+                        hasher, head_size = head
+                        head_groups.setdefault((size, hasher.digest()), []).append(
+                            (file_path, size, hasher, head_size))
+            
+            # Files ruled out by their first block were still examined
+            processed = sum(len(group) for group in head_groups.values() if len(group) == 1)
+            
+            # Full hash resumes from the head state instead of re-reading it
+            remaining = [
+                item
+                for group in head_groups.values() if len(group) > 1
+                for item in group
+            ]
+            futures = [
+                (batch, executor.submit(self._hash_batch, self._hash_file, batch))
+                for batch in self._batches(remaining, lambda item: max(item[1], HEAD_SIZE))
+            ]
+            
+            # Consume results in submission order so the kept copy stays deterministic
+            for batch, future in futures:
+                for (file_path, size, hasher, head_size), file_hash in zip(batch, future.result()):
+                    if isinstance(file_hash, Exception):
+                        print(f"\n⚠️  Error hashing {file_path}: {file_hash}")
+                        continue
+                    
+                    if file_hash in hash_dict:
+                        # A group is created with its first two files, so the kept copy leads it
+                        group = self.duplicates.get(file_hash)
+                        if group is None:
+                            self.duplicates[file_hash] = [hash_dict[file_hash], file_path]
                         else:
-                            hash_dict[file_hash] = file_path
-                        
-                        processed += 1
-                        if processed % 10 == 0:
-                            print(f"  Processed {processed} files...", end='\r')
+                            group.append(file_path)
+                    else:
+                        hash_dict[file_hash] = file_path
+                        self.group_sizes[file_hash] = size
                     
-                    except Exception as e:
-                        print(f"\n⚠️  Error hashing {file_path}: {e}")
+                    processed += 1
+                    if processed % 10 == 0:
+                        print(f"  Processed {processed} files...", end='\r')
         
         print(f"\n✅ Processed {processed} files")
         
-        # Remove entries with no duplicates
-        self.duplicates = {k: v for k, v in self.duplicates.items() if len(v) > 1}
+        # Only hashes seen more than once have a group
+        self.group_sizes = {k: self.group_sizes[k] for k in self.duplicates}
         
         return self.duplicates
     
@@ -87,19 +147,22 @@ class DuplicateFinder:
         print(f"📋 DUPLICATE FILES REPORT")
         print(f"{'='*80}\n")
         
+        # Collect the whole listing and write it once rather than a print per file
+        lines = []
         for i, (file_hash, files) in enumerate(self.duplicates.items(), 1):
-            file_size = files[0].stat().st_size
+            file_size = self.group_sizes[file_hash]
             wasted_space = file_size * (len(files) - 1)
             total_waste += wasted_space
             
-            print(f"Group {i} - {len(files)} copies ({self._format_size(file_size)} each)")
-            print(f"Hash: {file_hash[:16]}...")
-            print(f"Wasted space: {self._format_size(wasted_space)}")
+            lines.append(f"Group {i} - {len(files)} copies ({self._format_size(file_size)} each)\n")
+            lines.append(f"Hash: {file_hash[:16]}...\n")
+            lines.append(f"Wasted space: {self._format_size(wasted_space)}\n")
             
             for j, file_path in enumerate(files):
                 marker = "🟢 [KEEP]" if j == 0 else "🔴 [DUPLICATE]"
-                print(f"  {marker} {file_path}")
-            print()
+                lines.append(f"  {marker} {file_path}\n")
+            lines.append("\n")
+        sys.stdout.write(''.join(lines))
         
         print(f"{'='*80}")
         print(f"Summary:")
@@ -117,6 +180,7 @@ class DuplicateFinder:
         freed_space = 0
         
         for file_hash, files in self.duplicates.items():
+            file_size = self.group_sizes[file_hash]
             # Keep first file, delete rest
             for file_path in files[1:]:
                 if interactive:
@@ -125,7 +189,6 @@ class DuplicateFinder:
                         continue
                 
                 try:
-                    file_size = file_path.stat().st_size
                     file_path.unlink()
                     print(f"🗑️  Deleted: {file_path}")
                     deleted_count += 1
@@ -156,8 +219,7 @@ class DuplicateFinder:
                     dest_path = dest_dir / file_path.name
                     
                     # Handle name conflicts
-                    if dest_path.exists():
-                        dest_path = self._get_unique_path(dest_path)
+                    dest_path = self._get_unique_path(dest_path)
                     
                     shutil.move(str(file_path), str(dest_path))
                     print(f"📦 Moved: {file_path.name}")
@@ -178,7 +240,7 @@ class DuplicateFinder:
             f.write("=" * 80 + "\n\n")
             
             for i, (file_hash, files) in enumerate(self.duplicates.items(), 1):
-                file_size = files[0].stat().st_size
+                file_size = self.group_sizes[file_hash]
                 
                 f.write(f"Group {i} - {len(files)} copies\n")
                 f.write(f"Size: {self._format_size(file_size)}\n")
@@ -191,8 +253,8 @@ class DuplicateFinder:
             
             total_duplicates = sum(len(files) - 1 for files in self.duplicates.values())
             total_waste = sum(
-                files[0].stat().st_size * (len(files) - 1)
-                for files in self.duplicates.values()
+                self.group_sizes[file_hash] * (len(files) - 1)
+                for file_hash, files in self.duplicates.items()
             )
             
             f.write("=" * 80 + "\n")
@@ -202,24 +264,122 @@ class DuplicateFinder:
         print(f"✅ Report saved to: {output_file}")
     
     def _get_files(self):
-        """Get list of files to process"""
-        if self.recursive:
-            return [p for p in self.directory.rglob('*') if p.is_file()]
-        else:
-            return [p for p in self.directory.iterdir() if p.is_file()]
+        """Get (path, size) for each file to process, using scandir's cached stat"""
+        files = []
+        # Depth-first, parents before children, in the same order rglob walks
+        pending = [os.fspath(self.directory)]
+        
+        while pending:
+            folder = pending.pop()
+            subfolders = []
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_file():
+                                files.append((entry.path, entry.stat().st_size))
+                            elif self.recursive and entry.is_dir(follow_symlinks=False):
+                                subfolders.append(entry.path)
+                        except OSError as e:
+                            print(f"⚠️  Error accessing {entry.path}: {e}")
+            except PermissionError:
+                continue
+            pending.extend(reversed(subfolders))
+        
+        return files
+    
+    def _batches(self, items, cost):
+        """Split items into consecutive batches costing about HASH_BATCH_BYTES each"""
+        batch = []
+        batch_cost = 0
+        for item in items:
+            batch.append(item)
+            batch_cost += cost(item)
+            if batch_cost >= HASH_BATCH_BYTES:
+                yield batch
+                batch = []
+                batch_cost = 0
+        if batch:
+            yield batch
+    
+    def _hash_batch(self, func, batch):
+        """Call func on each argument tuple in one pool task, returning each result or its error"""
+        results = []
+        for args in batch:
+            try:
+                results.append(func(*args))
+            except Exception as e:
+                results.append(e)
+        return results
     
-    def _hash_file(self, file_path, chunk_size=8192):
-        """Compute hash of a file"""
-        if self.hash_algorithm == 'md5':
-            hasher = hashlib.md5()
-        elif self.hash_algorithm == 'sha256':
-            hasher = hashlib.sha256()
+    def _new_hasher(self):
+        """Create a hash object for the selected algorithm"""
+        # Identical-content detection needs no cryptographic strength, so the
+        # fast non-cryptographic hashes are preferred; imported only when chosen
+        if self.hash_algorithm == 'xxh3':
+            import xxhash
+            return xxhash.xxh3_128()
+        if self.hash_algorithm == 'blake3':
+            import blake3
+            return blake3.blake3()
+        if self.hash_algorithm == 'blake2b':
+            return hashlib.blake2b()
+        if self.hash_algorithm == 'sha256':
+            return hashlib.sha256()
+        return hashlib.md5()
+    
+    def _hash_head(self, file_path):
+        """Hash the first HEAD_SIZE bytes, returning (hasher, bytes hashed) so hashing can resume"""
+        hasher = self._new_hasher()
+        data = b''
+        with open(file_path, 'rb', buffering=0) as f:
+            # An unbuffered read may return less than asked for, e.g. on network filesystems
+            while len(data) < HEAD_SIZE:
+                chunk = f.read(HEAD_SIZE - len(data))
+                if not chunk:
+                    break
+                data += chunk
+        hasher.update(data)
+        return hasher, len(data)
+    
+    def _hash_file(self, file_path, size=None, head_hasher=None, head_size=0, chunk_size=1 << 20):
+        """Compute hash of a file, optionally continuing from a _hash_head result"""
+        if size is None:
+            size = os.stat(file_path).st_size
+        
+        if head_hasher is None:
+            hasher = self._new_hasher()
+            offset = 0
+        elif size <= head_size:
+            # The head already covered the whole file
+            return head_hasher.hexdigest()
         else:
-            hasher = hashlib.md5()
+            hasher = head_hasher.copy()
+            offset = head_size
         
-        with open(file_path, 'rb') as f:
-            while chunk := f.read(chunk_size):
-                hasher.update(chunk)
+        with open(file_path, 'rb', buffering=0) as f:
+            if size >= MMAP_THRESHOLD:
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        if hasattr(mm, 'madvise'):
+                            mm.madvise(mmap.MADV_SEQUENTIAL)
+                        with memoryview(mm) as view:
+                            hasher.update(view[offset:])
+                    return hasher.hexdigest()
+                except (OSError, ValueError):
+                    pass  # e.g. filesystems without mmap support; read instead
+            
+            f.seek(offset)
+            # Let the kernel read ahead aggressively; the thread pool supplies queue depth
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            
+            # hashlib's OpenSSL backend already uses SHA-NI/AVX2 where available;
+            # keep it busy with large reads into one reused buffer
+            buffer = bytearray(chunk_size)
+            view = memoryview(buffer)
+            while read := f.readinto(buffer):
+                hasher.update(view[:read])
         
         return hasher.hexdigest()
     
@@ -233,13 +393,15 @@ class DuplicateFinder:
     
     def _get_unique_path(self, path):
         """Generate a unique path if file already exists"""
-        path = Path(path)
+        path = os.fspath(path)
+        parent, name = os.path.split(path)
+        stem, suffix = os.path.splitext(name)
         counter = 1
-        while path.exists():
-            new_name = f"{path.stem}_{counter}{path.suffix}"
-            path = path.parent / new_name
+        candidate = path
+        while os.path.lexists(candidate):
+            candidate = os.path.join(parent, f"{stem}_{counter}{suffix}")
             counter += 1
-        return path
+        return candidate
 
 
 def main():
@@ -258,19 +420,22 @@ Examples:
     
     parser.add_argument('directory', help='Directory to scan for duplicates')
     parser.add_argument('-r', '--recursive', action='store_true', help='Scan subdirectories')
-    parser.add_argument('--algorithm', choices=['md5', 'sha256'], default='md5',
-                       help='Hash algorithm (default: md5)')
+    parser.add_argument('--algorithm', choices=['xxh3', 'blake3', 'blake2b', 'md5', 'sha256'], default='xxh3',
+                       help='Hash algorithm (default: xxh3)')
     parser.add_argument('--delete', action='store_true', help='Delete duplicate files')
     parser.add_argument('--interactive', action='store_true', help='Confirm each deletion')
     parser.add_argument('--move', metavar='DEST', help='Move duplicates to directory')
     parser.add_argument('--report', metavar='FILE', help='Generate report file')
+    parser.add_argument('--max-concurrency', type=int, metavar='N',
+                       help='Maximum number of files to hash in parallel')
     
     args = parser.parse_args()
     
-    finder = DuplicateFinder(args.directory, args.recursive)
+    finder = DuplicateFinder(args.directory, args.recursive, args.max_concurrency)
     
     # Find duplicates
-    finder.find_duplicates(args.algorithm)
+    if finder.find_duplicates(args.algorithm) is None:
+        sys.exit(1)
     
     # Display results
     finder.display_duplicates()
@@ -5,32 +5,76 @@ Parse and analyze log files to extract insights and generate reports
 """
 
 import re
+import sys
+import mmap
 import argparse
+from array import array
 from pathlib import Path
 from datetime import datetime
-from collections import Counter, defaultdict
+from collections import Counter, defaultdict, deque
 import csv
 import json
+import os
+import stat
+
+# Log levels in priority order: when a line mentions several, the first listed wins
+LOG_LEVELS = ('ERROR', 'FATAL', 'CRITICAL', 'WARNING', 'WARN', 'INFO', 'DEBUG', 'TRACE')
+LEVEL_NEEDLES = tuple((level.encode(), level) for level in LOG_LEVELS)
+LEVEL_CODES = {level: code for code, level in enumerate(LOG_LEVELS)}
+# A log level or a timestamp; lines with neither contribute nothing. Matched
+# case-sensitively against upper-cased text, which re scans far faster than
+# IGNORECASE, with the timestamps factored behind one leading digit
+RELEVANT_TOKEN_PATTERN = re.compile(
+    '|'.join(LOG_LEVELS).encode() +
+    rb'|\d(?:\d{3}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}|\d/\w{3}/\d{4}:\d{2}:\d{2}:\d{2})'
+)
+SCAN_CHUNK_SIZE = 8 << 20
+# Common log patterns, compiled once
+LOG_FORMAT_PATTERNS = {
+    'apache': re.compile(r'(\S+) \S+ \S+ \[(.*?)\] "(\S+) (\S+) (\S+)" (\d+) (\d+)'),
+    'nginx': re.compile(r'(\S+) - - \[(.*?)\] "(\S+) (\S+) (\S+)" (\d+) (\d+)'),
+    'python': re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - (\w+) - (.*)'),
+    'generic': re.compile(r'(\d{4}-\d{2}-\d{2}|\d{2}/\w{3}/\d{4}).*?(ERROR|WARN|INFO|DEBUG).*')
+}
+# Timestamp patterns, tried in order against the raw bytes of a line
+TIMESTAMP_PATTERNS = (
+    re.compile(rb'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})'),
+    re.compile(rb'(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2})'),
+    re.compile(rb'\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\]')
+)
+# Month abbreviations as strptime's %b accepts them (any case)
+MONTHS = {name: number for number, name in enumerate(
+    (b'jan', b'feb', b'mar', b'apr', b'may', b'jun', b'jul', b'aug', b'sep', b'oct', b'nov', b'dec'), 1)}
+# Most recent errors/warnings included in the JSON export
+EXPORTED_ISSUES = 50
 
 class LogAnalyzer:
-    def __init__(self, logfile):
+    def __init__(self, logfile, keep_last=None):
         self.logfile = Path(logfile)
-        self.entries = []
+        # Entries are stored column-wise; messages stay in the log file and are
+        # read back by byte offset only when shown or exported
+        self.entry_lines = array('q')
+        self.entry_levels = bytearray()
+        self.entry_starts = array('q')
+        self.entry_ends = array('q')
+        # Contents of a non-seekable input (pipe, FIFO, process substitution), which
+        # can't be mapped or read a second time for messages
+        self._stream_data = None
         self.stats = {
             'total_lines': 0,
             'log_levels': Counter(),
-            'errors': [],
-            'warnings': [],
+            # Only the most recent keep_last are retained (all when None); counts stay exact
+            'errors': deque(maxlen=keep_last),
+            'warnings': deque(maxlen=keep_last),
+            'error_count': 0,
+            'warning_count': 0,
             'time_distribution': defaultdict(int)
         }
+        # Preallocated histogram indexed by hour, folded into time_distribution after parsing
+        self.hour_counts = [0] * 24
         
         # Common log patterns
-        self.patterns = {
-            'apache': r'(\S+) \S+ \S+ \[(.*?)\] "(\S+) (\S+) (\S+)" (\d+) (\d+)',
-            'nginx': r'(\S+) - - \[(.*?)\] "(\S+) (\S+) (\S+)" (\d+) (\d+)',
-            'python': r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - (\w+) - (.*)',
-            'generic': r'(\d{4}-\d{2}-\d{2}|\d{2}/\w{3}/\d{4}).*?(ERROR|WARN|INFO|DEBUG).*'
-        }
+        self.patterns = LOG_FORMAT_PATTERNS
     
     def parse_log(self, log_format='generic'):
         """Parse log file"""
@@ -42,38 +86,18 @@ class LogAnalyzer:
         print(f"Format: {log_format}\n")
         
         try:
-            with open(self.logfile, 'r', encoding='utf-8', errors='ignore') as f:
-                for line_num, line in enumerate(f, 1):
-                    self.stats['total_lines'] += 1
-                    line = line.strip()
-                    
-                    if not line:
-                        continue
-                    
-                    # Extract log level
-                    level = self._extract_log_level(line)
-                    if level:
-                        self.stats['log_levels'][level] += 1
-                        
-                        entry = {
-                            'line_number': line_num,
-                            'level': level,
-                            'message': line
-                        }
-                        
-                        # Store errors and warnings separately
-                        if level == 'ERROR':
-                            self.stats['errors'].append(entry)
-                        elif level in ['WARN', 'WARNING']:
-                            self.stats['warnings'].append(entry)
-                        
-                        self.entries.append(entry)
-                    
-                    # Extract timestamp for time distribution
-                    timestamp = self._extract_timestamp(line)
-                    if timestamp:
-                        hour = timestamp.hour
-                        self.stats['time_distribution'][hour] += 1
+            with open(self.logfile, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if stat.S_ISREG(st.st_mode) and st.st_size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                            mm.madvise(mmap.MADV_SEQUENTIAL)
+                        self._parse_buffer(mm)
+                else:
+                    # Streams report no size and can't be mapped, so read them whole
+                    self._stream_data = f.read()
+                    if self._stream_data:
+                        self._parse_buffer(self._stream_data)
             
             print(f"✅ Parsed {self.stats['total_lines']} lines")
             return True
@@ -82,6 +106,75 @@ class LogAnalyzer:
             print(f"❌ Error parsing log file: {e}")
             return False
     
+    def _parse_buffer(self, mm):
+        """Parse a mapped (or fully read) log file, handing only relevant lines to Python"""
+        size = len(mm)
+        newlines = 0
+        line_num = 1
+        chunk_start = 0
+        
+        while chunk_start < size:
+            # Chunks end on a newline so no line is split between two of them
+            chunk_end = mm.find(b'\n', min(chunk_start + SCAN_CHUNK_SIZE, size))
+            chunk_end = size if chunk_end < 0 else chunk_end + 1
+            chunk = mm[chunk_start:chunk_end].upper()
+            newlines += chunk.count(b'\n')
+            pos = 0
+            
+            while True:
+                match = RELEVANT_TOKEN_PATTERN.search(chunk, pos)
+                if not match:
+                    break
+                
+                line_start = chunk.rfind(b'\n', pos, match.start()) + 1
+                if line_start == 0:
+                    line_start = pos
+                line_end = chunk.find(b'\n', match.end())
+                if line_end < 0:
+                    line_end = len(chunk)
+                
+                line_num += chunk.count(b'\n', pos, line_start)
+                start = chunk_start + line_start
+                end = chunk_start + line_end
+                self._parse_line(mm[start:end], chunk[line_start:line_end], line_num, start, end)
+                pos = line_end + 1
+                line_num += 1
+            
+            line_num += chunk.count(b'\n', pos)
+            chunk_start = chunk_end
+        
+        self.stats['total_lines'] = newlines + (mm[-1] != ord('\n'))
+        
+        for hour, count in enumerate(self.hour_counts):
+            if count:
+                self.stats['time_distribution'][hour] = count
+    
+    def _parse_line(self, line, upper_line, line_num, start, end):
+        """Record the level and timestamp of a single log line"""
+        # Extract log level
+        level = self._extract_log_level(upper_line)
+        if level:
+            self.stats['log_levels'][level] += 1
+            
+            index = len(self.entry_lines)
+            self.entry_lines.append(line_num)
+            self.entry_levels.append(LEVEL_CODES[level])
+            self.entry_starts.append(start)
+            self.entry_ends.append(end)
+            
+            # Store errors and warnings separately
+            if level == 'ERROR':
+                self.stats['errors'].append(index)
+                self.stats['error_count'] += 1
+            elif level in ['WARN', 'WARNING']:
+                self.stats['warnings'].append(index)
+                self.stats['warning_count'] += 1
+        
+        # Extract timestamp for time distribution
+        timestamp = self._extract_timestamp(line)
+        if timestamp:
+            self.hour_counts[timestamp.hour] += 1
+    
     def display_statistics(self):
         """Display log statistics"""
         print(f"\n{'='*80}")
@@ -90,20 +183,20 @@ class LogAnalyzer:
         
         print(f"File: {self.logfile.name}")
         print(f"Total lines: {self.stats['total_lines']:,}")
-        print(f"Log entries: {len(self.entries):,}\n")
+        print(f"Log entries: {len(self.entry_lines):,}\n")
         
         # Log level distribution
         print("📋 Log Level Distribution:")
         if self.stats['log_levels']:
             for level, count in self.stats['log_levels'].most_common():
-                percentage = (count / len(self.entries)) * 100
+                percentage = (count / len(self.entry_lines)) * 100
                 bar = '█' * int(percentage / 2)
                 print(f"  {level:<10} {count:>6} ({percentage:>5.1f}%) {bar}")
         else:
             print("  No log levels detected")
         
-        print(f"\n🔴 Errors: {len(self.stats['errors'])}")
-        print(f"⚠️  Warnings: {len(self.stats['warnings'])}")
+        print(f"\n🔴 Errors: {self.stats['error_count']}")
+        print(f"⚠️  Warnings: {self.stats['warning_count']}")
         
         # Time distribution
         if self.stats['time_distribution']:
@@ -120,12 +213,13 @@ class LogAnalyzer:
             return
         
         print(f"\n{'='*80}")
-        print(f"🔴 ERROR LOG (showing last {min(limit, len(self.stats['errors']))} errors)")
+        print(f"🔴 ERROR LOG (showing last {min(limit, self.stats['error_count'])} errors)")
         print(f"{'='*80}\n")
         
-        for entry in self.stats['errors'][-limit:]:
-            print(f"Line {entry['line_number']}:")
-            print(f"  {entry['message']}\n")
+        entries = self._read_entries(list(self.stats['errors'])[-limit:])
+        sys.stdout.write(''.join(
+            f"Line {line_number}:\n  {message}\n\n" for line_number, level, message in entries
+        ))
     
     def show_warnings(self, limit=10):
         """Display recent warnings"""
@@ -134,12 +228,13 @@ class LogAnalyzer:
             return
         
         print(f"\n{'='*80}")
-        print(f"⚠️  WARNING LOG (showing last {min(limit, len(self.stats['warnings']))} warnings)")
+        print(f"⚠️  WARNING LOG (showing last {min(limit, self.stats['warning_count'])} warnings)")
         print(f"{'='*80}\n")
         
-        for entry in self.stats['warnings'][-limit:]:
-            print(f"Line {entry['line_number']}:")
-            print(f"  {entry['message']}\n")
+        entries = self._read_entries(list(self.stats['warnings'])[-limit:])
+        sys.stdout.write(''.join(
+            f"Line {line_number}:\n  {message}\n\n" for line_number, level, message in entries
+        ))
     
     def search_pattern(self, pattern):
         """Search for a pattern in log file"""
@@ -149,15 +244,16 @@ class LogAnalyzer:
         try:
             regex = re.compile(pattern, re.IGNORECASE)
             
-            for entry in self.entries:
-                if regex.search(entry['message']):
+            for entry in self._read_entries(range(len(self.entry_lines))):
+                if regex.search(entry[2]):
                     matches.append(entry)
             
             if matches:
                 print(f"Found {len(matches)} match(es):\n")
-                for entry in matches[:20]:  # Show first 20
-                    print(f"Line {entry['line_number']} [{entry['level']}]:")
-                    print(f"  {entry['message']}\n")
+                sys.stdout.write(''.join(
+                    f"Line {line_number} [{level}]:\n  {message}\n\n"
+                    for line_number, level, message in matches[:20]  # Show first 20
+                ))
                 
                 if len(matches) > 20:
                     print(f"... and {len(matches) - 20} more matches")
@@ -170,24 +266,24 @@ class LogAnalyzer:
     def export_to_csv(self, output_file='log_analysis.csv'):
         """Export statistics to CSV"""
         try:
+            # Header and statistics
+            rows = [
+                ['Metric', 'Value'],
+                ['Total Lines', self.stats['total_lines']],
+                ['Log Entries', len(self.entry_lines)],
+                ['Errors', self.stats['error_count']],
+                ['Warnings', self.stats['warning_count']],
+                [],
+                ['Log Level', 'Count', 'Percentage']
+            ]
+            
+            # Log level distribution
+            for level, count in self.stats['log_levels'].most_common():
+                percentage = (count / len(self.entry_lines)) * 100 if self.entry_lines else 0
+                rows.append([level, count, f"{percentage:.2f}%"])
+            
             with open(output_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                
-                # Write header
-                writer.writerow(['Metric', 'Value'])
-                
-                # Write statistics
-                writer.writerow(['Total Lines', self.stats['total_lines']])
-                writer.writerow(['Log Entries', len(self.entries)])
-                writer.writerow(['Errors', len(self.stats['errors'])])
-                writer.writerow(['Warnings', len(self.stats['warnings'])])
-                writer.writerow([])
-                
-                # Write log level distribution
-                writer.writerow(['Log Level', 'Count', 'Percentage'])
-                for level, count in self.stats['log_levels'].most_common():
-                    percentage = (count / len(self.entries)) * 100 if self.entries else 0
-                    writer.writerow([level, count, f"{percentage:.2f}%"])
+                csv.writer(f).writerows(rows)
             
             print(f"✅ Statistics exported to: {output_file}")
             
@@ -197,70 +293,93 @@ class LogAnalyzer:
     def export_to_json(self, output_file='log_analysis.json'):
         """Export full analysis to JSON"""
         try:
+            recent_errors = list(self.stats['errors'])[-EXPORTED_ISSUES:]
+            recent_warnings = list(self.stats['warnings'])[-EXPORTED_ISSUES:]
             data = {
                 'file': str(self.logfile),
                 'analyzed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 'statistics': {
                     'total_lines': self.stats['total_lines'],
-                    'log_entries': len(self.entries),
-                    'errors': len(self.stats['errors']),
-                    'warnings': len(self.stats['warnings']),
+                    'log_entries': len(self.entry_lines),
+                    'errors': self.stats['error_count'],
+                    'warnings': self.stats['warning_count'],
                     'log_levels': dict(self.stats['log_levels']),
                     'time_distribution': dict(self.stats['time_distribution'])
                 },
                 'errors': [
-                    {'line': e['line_number'], 'message': e['message']}
-                    for e in self.stats['errors'][-50:]  # Last 50 errors
+                    {'line': line_number, 'message': message}
+                    for line_number, level, message in self._read_entries(recent_errors)
                 ],
                 'warnings': [
-                    {'line': w['line_number'], 'message': w['message']}
-                    for w in self.stats['warnings'][-50:]  # Last 50 warnings
+                    {'line': line_number, 'message': message}
+                    for line_number, level, message in self._read_entries(recent_warnings)
                 ]
             }
             
+            # Serialize fully before opening the file: one write instead of one per
+            # token, and a serialization error cannot leave a truncated export
+            payload = json.dumps(data, indent=2, ensure_ascii=False)
             with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+                f.write(payload)
             
             print(f"✅ Full analysis exported to: {output_file}")
             
         except Exception as e:
             print(f"❌ Error exporting to JSON: {e}")
     
-    def _extract_log_level(self, line):
-        """Extract log level from line"""
-        levels = ['ERROR', 'FATAL', 'CRITICAL', 'WARNING', 'WARN', 'INFO', 'DEBUG', 'TRACE']
-        line_upper = line.upper()
+    def _read_entries(self, indices):
+        """Yield (line number, level, message) for the given entries, reading messages from the log"""
+        if not indices:
+            return
         
-        for level in levels:
-            if level in line_upper:
+        if self._stream_data is not None:
+            yield from self._entries_from(self._stream_data, indices)
+            return
+        
+        with open(self.logfile, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from self._entries_from(mm, indices)
+    
+    def _entries_from(self, buffer, indices):
+        """Yield (line number, level, message) for the given entries from the log's bytes"""
+        for i in indices:
+            message = buffer[self.entry_starts[i]:self.entry_ends[i]]
+            yield (self.entry_lines[i], LOG_LEVELS[self.entry_levels[i]],
+                   message.decode('utf-8', errors='ignore').strip())
+    
+    def _extract_log_level(self, upper_line):
+        """Extract log level from an upper-cased line"""
+        for needle, level in LEVEL_NEEDLES:
+            if needle in upper_line:
                 return level
         
         return None
     
     def _extract_timestamp(self, line):
-        """Extract timestamp from line"""
-        # Common timestamp patterns
-        patterns = [
-            r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})',
-            r'(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2})',
-            r'\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\]'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, line)
+        """Extract timestamp from the raw bytes of a line"""
+        for pattern in TIMESTAMP_PATTERNS:
+            match = pattern.search(line)
             if match:
-                try:
-                    timestamp_str = match.group(1)
-                    # Try different formats
-                    for fmt in ['%Y-%m-%d %H:%M:%S', '%d/%b/%Y:%H:%M:%S']:
-                        try:
-                            return datetime.strptime(timestamp_str, fmt)
-                        except ValueError:
-                            continue
-                except Exception:
-                    pass
+                timestamp = self._parse_timestamp(match.group(1))
+                if timestamp:
+                    return timestamp
         
         return None
+    
+    def _parse_timestamp(self, ts):
+        """Parse 'YYYY-MM-DD HH:MM:SS' or 'DD/Mon/YYYY:HH:MM:SS' by position, without strptime"""
+        try:
+            if ts[2:3] == b'/':
+                month = MONTHS.get(ts[3:6].lower())
+                if month is None:
+                    return None
+                return datetime(int(ts[7:11]), month, int(ts[0:2]),
+                                int(ts[12:14]), int(ts[15:17]), int(ts[18:20]))
+            return datetime(int(ts[0:4]), int(ts[5:7]), int(ts[8:10]),
+                            int(ts[11:13]), int(ts[14:16]), int(ts[17:19]))
+        except ValueError:
+            # Out-of-range fields, e.g. month 13 or Feb 30
+            return None
 
 
 def main():
@@ -286,10 +405,14 @@ Examples:
     parser.add_argument('--limit', type=int, default=10, help='Limit results (default: 10)')
     parser.add_argument('--export-csv', metavar='FILE', help='Export statistics to CSV')
     parser.add_argument('--export-json', metavar='FILE', help='Export full analysis to JSON')
+    parser.add_argument('--keep-all-errors', action='store_true',
+                       help='Keep every error and warning in memory, not just the most recent')
     
     args = parser.parse_args()
     
-    analyzer = LogAnalyzer(args.logfile)
+    # Only the entries that can be shown or exported need to be kept
+    keep_last = None if args.keep_all_errors or args.limit <= 0 else max(args.limit, EXPORTED_ISSUES)
+    analyzer = LogAnalyzer(args.logfile, keep_last)
     
     # Parse log file
     if not analyzer.parse_log(args.format):
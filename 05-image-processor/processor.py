@@ -6,24 +6,46 @@ Requires: pip install Pillow
 """
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
 import os
+import shutil
+
+# Size units in steps of 1024
+SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+# Sum of the standard (IJG quality 50) JPEG luminance quantization table
+JPEG_LUMA_TABLE_SUM = 3688
 
 class ImageProcessor:
-    def __init__(self, input_dir, output_dir=None):
+    def __init__(self, input_dir, output_dir=None, max_concurrency=None):
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir) if output_dir else self.input_dir / 'processed'
+        # Pillow releases the GIL while decoding, resampling and encoding
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        # (image size, text, position, opacity) -> (text layer, destination) or None
+        self._watermark_cache = {}
+        # Watermark font per size, and text bounding box per (font size, text)
+        self._font_cache = {}
+        self._text_bbox_cache = {}
         self.supported_formats = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp', '.tiff'}
         self.processed_count = 0
+        self._image_entries = None
     
-    def get_images(self):
-        """Get list of image files"""
-        images = []
-        for file_path in self.input_dir.iterdir():
-            if file_path.is_file() and file_path.suffix.lower() in self.supported_formats:
-                images.append(file_path)
-        return images
+    def get_images(self, with_sizes=False):
+        """Get list of image files, as (path, size) pairs if with_sizes"""
+        # The folder is scanned once; DirEntry also caches its stat for later size requests
+        if self._image_entries is None:
+            with os.scandir(self.input_dir) as entries:
+                self._image_entries = [
+                    (Path(entry.path), entry) for entry in entries
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in self.supported_formats
+                ]
+        
+        if with_sizes:
+            return [(file_path, entry.stat().st_size) for file_path, entry in self._image_entries]
+        return [file_path for file_path, entry in self._image_entries]
     
     def resize_images(self, width=None, height=None, maintain_aspect=True):
         """Resize images to specified dimensions"""
@@ -42,41 +64,16 @@ class ImageProcessor:
         print(f"Target size: {width or 'auto'}x{height or 'auto'}")
         print(f"Maintain aspect ratio: {maintain_aspect}\n")
         
-        for img_path in images:
-            try:
-                with Image.open(img_path) as img:
-                    original_size = img.size
-                    
-                    if maintain_aspect:
-                        # Calculate new size maintaining aspect ratio
-                        if width and not height:
-                            ratio = width / img.width
-                            new_size = (width, int(img.height * ratio))
-                        elif height and not width:
-                            ratio = height / img.height
-                            new_size = (int(img.width * ratio), height)
-                        elif width and height:
-                            img.thumbnail((width, height), Image.Resampling.LANCZOS)
-                            new_size = img.size
-                        else:
-                            print(f"⚠️  Skipping {img_path.name}: No dimensions specified")
-                            continue
-                    else:
-                        new_size = (width or img.width, height or img.height)
-                    
-                    if maintain_aspect and (width and not height or height and not width):
-                        resized = img.resize(new_size, Image.Resampling.LANCZOS)
-                    else:
-                        resized = img
-                    
-                    output_path = self.output_dir / img_path.name
-                    resized.save(output_path, quality=95)
-                    
-                    print(f"✅ {img_path.name}: {original_size} → {new_size}")
-                    self.processed_count += 1
-                    
-            except Exception as e:
-                print(f"❌ Error processing {img_path.name}: {e}")
+        for img_path, result, error in self._map_images(self._resize_one, images,
+                                                         width, height, maintain_aspect):
+            if error:
+                print(f"❌ Error processing {img_path.name}: {error}")
+            elif result is None:
+                print(f"⚠️  Skipping {img_path.name}: No dimensions specified")
+            else:
+                original_size, new_size = result
+                print(f"✅ {img_path.name}: {original_size} → {new_size}")
+                self.processed_count += 1
         
         print(f"\n✨ Processed {self.processed_count} image(s)")
         print(f"📁 Output directory: {self.output_dir}")
@@ -97,27 +94,15 @@ class ImageProcessor:
         
         print(f"🔄 Converting {len(images)} image(s) to {output_format.upper()}...\n")
         
-        for img_path in images:
-            try:
-                with Image.open(img_path) as img:
-                    # Convert RGBA to RGB for JPEG
-                    if output_format in ['jpg', 'jpeg'] and img.mode in ['RGBA', 'LA', 'P']:
-                        rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-                        if img.mode == 'P':
-                            img = img.convert('RGBA')
-                        rgb_img.paste(img, mask=img.split()[-1] if img.mode in ['RGBA', 'LA'] else None)
-                        img = rgb_img
-                    
-                    output_name = img_path.stem + f'.{output_format}'
-                    output_path = self.output_dir / output_name
-                    
-                    img.save(output_path, quality=95)
-                    
-                    print(f"✅ {img_path.name} → {output_name}")
-                    self.processed_count += 1
-                    
-            except Exception as e:
-                print(f"❌ Error converting {img_path.name}: {e}")
+        # Images sharing a stem write the same output file, so those run in order
+        # within one task and the last one still wins
+        for img_path, output_name, error in self._map_images(
+                self._convert_one, images, output_format, key=lambda path: path.stem.lower()):
+            if error:
+                print(f"❌ Error converting {img_path.name}: {error}")
+            else:
+                print(f"✅ {img_path.name} → {output_name}")
+                self.processed_count += 1
         
         print(f"\n✨ Converted {self.processed_count} image(s)")
         print(f"📁 Output directory: {self.output_dir}")
@@ -128,7 +113,9 @@ class ImageProcessor:
             print(f"❌ Input directory '{self.input_dir}' does not exist!")
             return
         
-        images = self.get_images()
+        # Sizes come from the directory scan so workers don't stat the originals again
+        sizes = dict(self.get_images(with_sizes=True))
+        images = list(sizes)
         if not images:
             print("❌ No images found!")
             return
@@ -140,35 +127,23 @@ class ImageProcessor:
         total_original_size = 0
         total_compressed_size = 0
         
-        for img_path in images:
-            try:
-                original_size = img_path.stat().st_size
-                total_original_size += original_size
-                
-                with Image.open(img_path) as img:
-                    output_path = self.output_dir / img_path.name
-                    
-                    # Optimize based on format
-                    if img_path.suffix.lower() in ['.jpg', '.jpeg']:
-                        img.save(output_path, 'JPEG', quality=quality, optimize=True)
-                    elif img_path.suffix.lower() == '.png':
-                        img.save(output_path, 'PNG', optimize=True)
-                    else:
-                        img.save(output_path, quality=quality, optimize=True)
-                    
-                    compressed_size = output_path.stat().st_size
-                    total_compressed_size += compressed_size
-                    
-                    reduction = ((original_size - compressed_size) / original_size) * 100
-                    
-                    print(f"✅ {img_path.name}: {self._format_size(original_size)} → "
-                          f"{self._format_size(compressed_size)} (-{reduction:.1f}%)")
-                    self.processed_count += 1
-                    
-            except Exception as e:
-                print(f"❌ Error compressing {img_path.name}: {e}")
+        for img_path, result, error in self._map_images(self._compress_one, images, quality, sizes):
+            if error:
+                print(f"❌ Error compressing {img_path.name}: {error}")
+                continue
+            
+            original_size, compressed_size = result
+            total_original_size += original_size
+            total_compressed_size += compressed_size
+            
+            reduction = ((original_size - compressed_size) / original_size) * 100
+            
+            print(f"✅ {img_path.name}: {self._format_size(original_size)} → "
+                  f"{self._format_size(compressed_size)} (-{reduction:.1f}%)")
+            self.processed_count += 1
         
-        total_reduction = ((total_original_size - total_compressed_size) / total_original_size) * 100
+        total_reduction = ((total_original_size - total_compressed_size) / total_original_size) * 100 \
+            if total_original_size else 0
         
         print(f"\n✨ Compressed {self.processed_count} image(s)")
         print(f"💾 Total saved: {self._format_size(total_original_size - total_compressed_size)} "
@@ -190,79 +165,238 @@ class ImageProcessor:
         
         print(f"💧 Adding watermark '{text}' to {len(images)} image(s)...\n")
         
+        for img_path, result, error in self._map_images(self._watermark_one, images,
+                                                         text, position, opacity):
+            if error:
+                print(f"❌ Error watermarking {img_path.name}: {error}")
+            else:
+                print(f"✅ {img_path.name}")
+                self.processed_count += 1
+        
+        print(f"\n✨ Watermarked {self.processed_count} image(s)")
+        print(f"📁 Output directory: {self.output_dir}")
+    
+    def _map_images(self, func, images, *args, key=None):
+        """Run func(img_path, *args) over images on a thread pool, yielding
+        (img_path, result, error) as each finishes"""
+        # Images with the same key are processed in order within a single task
+        chains = {}
         for img_path in images:
+            chains.setdefault(key(img_path) if key else img_path, []).append(img_path)
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = [executor.submit(self._run_chain, func, chain, args) for chain in chains.values()]
+            for future in as_completed(futures):
+                yield from future.result()
+    
+    def _run_chain(self, func, chain, args):
+        """Process a chain of images in order, keeping each result or its error"""
+        results = []
+        for img_path in chain:
             try:
-                with Image.open(img_path) as img:
-                    # Convert to RGBA if necessary
-                    if img.mode != 'RGBA':
-                        img = img.convert('RGBA')
-                    
-                    # Create watermark layer
-                    watermark = Image.new('RGBA', img.size, (0, 0, 0, 0))
-                    draw = ImageDraw.Draw(watermark)
-                    
-                    # Try to use a nice font, fall back to default
-                    try:
-                        font_size = max(20, img.height // 30)
-                        font = ImageFont.truetype("arial.ttf", font_size)
-                    except:
-                        font = ImageFont.load_default()
-                    
-                    # Get text bounding box
-                    bbox = draw.textbbox((0, 0), text, font=font)
-                    text_width = bbox[2] - bbox[0]
-                    text_height = bbox[3] - bbox[1]
-                    
-                    # Calculate position
-                    margin = 10
-                    if position == 'bottom-right':
-                        x = img.width - text_width - margin
-                        y = img.height - text_height - margin
-                    elif position == 'bottom-left':
-                        x = margin
-                        y = img.height - text_height - margin
-                    elif position == 'top-right':
-                        x = img.width - text_width - margin
-                        y = margin
-                    elif position == 'top-left':
-                        x = margin
-                        y = margin
-                    elif position == 'center':
-                        x = (img.width - text_width) // 2
-                        y = (img.height - text_height) // 2
-                    else:
-                        x = img.width - text_width - margin
-                        y = img.height - text_height - margin
-                    
-                    # Draw text with semi-transparency
-                    draw.text((x, y), text, fill=(255, 255, 255, opacity), font=font)
-                    
-                    # Composite watermark onto image
-                    watermarked = Image.alpha_composite(img, watermark)
-                    
-                    # Convert back to original mode if needed
-                    if img_path.suffix.lower() in ['.jpg', '.jpeg']:
-                        watermarked = watermarked.convert('RGB')
-                    
-                    output_path = self.output_dir / img_path.name
-                    watermarked.save(output_path, quality=95)
-                    
-                    print(f"✅ {img_path.name}")
-                    self.processed_count += 1
-                    
+                results.append((img_path, func(img_path, *args), None))
             except Exception as e:
-                print(f"❌ Error watermarking {img_path.name}: {e}")
+                results.append((img_path, None, e))
+        return results
+    
+    def _resize_one(self, img_path, width, height, maintain_aspect):
+        """Resize a single image, returning (original size, new size) or None if skipped"""
+        with Image.open(img_path) as img:
+            original_size = img.size
+            
+            if maintain_aspect:
+                # Calculate new size maintaining aspect ratio
+                if width and not height:
+                    ratio = width / img.width
+                    new_size = (width, int(img.height * ratio))
+                elif height and not width:
+                    ratio = height / img.height
+                    new_size = (int(img.width * ratio), height)
+                elif width and height:
+                    img.thumbnail((width, height), Image.Resampling.LANCZOS)
+                    new_size = img.size
+                else:
+                    return None
+            else:
+                new_size = (width or img.width, height or img.height)
+            
+            output_path = self.output_dir / img_path.name
+            
+            if new_size == original_size:
+                # Nothing to resample, so copy the file instead of re-encoding it
+                try:
+                    shutil.copyfile(img_path, output_path)
+                except shutil.SameFileError:
+                    pass
+                return original_size, new_size
+            
+            if maintain_aspect and (width and not height or height and not width):
+                if img_path.suffix.lower() in ('.jpg', '.jpeg'):
+                    # Let libjpeg decode at 1/2, 1/4 or 1/8 scale while staying at least twice
+                    # new_size, the same reducing gap thumbnail() keeps for the box-fit path
+                    img.draft(None, (new_size[0] * 2, new_size[1] * 2))
+                resized = img.resize(new_size, Image.Resampling.LANCZOS)
+            else:
+                resized = img
+            
+            resized.save(output_path, quality=95)
         
-        print(f"\n✨ Watermarked {self.processed_count} image(s)")
-        print(f"📁 Output directory: {self.output_dir}")
+        return original_size, new_size
+    
+    def _convert_one(self, img_path, output_format):
+        """Convert a single image, returning the output file name"""
+        with Image.open(img_path) as img:
+            # Convert RGBA to RGB for JPEG
+            if output_format in ['jpg', 'jpeg'] and img.mode in ['RGBA', 'LA', 'P']:
+                rgb_img = Image.new('RGB', img.size, (255, 255, 255))
+                if img.mode == 'P':
+                    img = img.convert('RGBA')
+                rgb_img.paste(img, mask=img.split()[-1] if img.mode in ['RGBA', 'LA'] else None)
+                img = rgb_img
+            
+            output_name = img_path.stem + f'.{output_format}'
+            output_path = self.output_dir / output_name
+            
+            img.save(output_path, quality=95)
+        
+        return output_name
+    
+    def _compress_one(self, img_path, quality, sizes):
+        """Compress a single image, returning (original size, compressed size)"""
+        original_size = sizes[img_path]
+        
+        with Image.open(img_path) as img:
+            output_path = self.output_dir / img_path.name
+            
+            # Optimize based on format
+            if img_path.suffix.lower() in ['.jpg', '.jpeg']:
+                if img.format == 'JPEG' and self._jpeg_quality(img) <= quality:
+                    # Requantizing at or above the source's quality can't add detail and
+                    # usually grows the file, so re-encode with its own tables and subsampling
+                    img.save(output_path, 'JPEG', quality='keep', optimize=True)
+                else:
+                    img.save(output_path, 'JPEG', quality=quality, optimize=True)
+            elif img_path.suffix.lower() == '.png':
+                img.save(output_path, 'PNG', optimize=True)
+            else:
+                img.save(output_path, quality=quality, optimize=True)
+        
+        compressed_size = output_path.stat().st_size
+        return original_size, compressed_size
+    
+    def _jpeg_quality(self, img):
+        """Estimate the IJG quality a JPEG was saved at from its luminance table"""
+        tables = getattr(img, 'quantization', None)
+        if not tables:
+            return 100
+        # Tables are the standard one scaled by 5000/q below quality 50 and by 200-2q above
+        scale = sum(tables[0]) * 100 / JPEG_LUMA_TABLE_SUM
+        return round((200 - scale) / 2 if scale <= 100 else 5000 / scale)
+    
+    def _watermark_one(self, img_path, text, position, opacity):
+        """Add the text watermark to a single image"""
+        with Image.open(img_path) as img:
+            is_jpeg = img_path.suffix.lower() in ['.jpg', '.jpeg']
+            
+            # An RGB image saved back as RGB needs no alpha plane: pasting through the
+            # layer's alpha over opaque pixels gives the same result as compositing
+            opaque = is_jpeg and img.mode == 'RGB'
+            
+            # Convert to RGBA if necessary
+            if img.mode != 'RGBA' and not opaque:
+                img = img.convert('RGBA')
+            
+            # Composite the (cached) text layer onto just the region it covers
+            watermark = self._watermark_layer(img.size, text, position, opacity)
+            if watermark:
+                layer, dest = watermark
+                if opaque:
+                    img.paste(layer, dest, layer)
+                else:
+                    img.alpha_composite(layer, dest)
+            watermarked = img
+            
+            # Convert back to original mode if needed
+            if is_jpeg and not opaque:
+                watermarked = watermarked.convert('RGB')
+            
+            output_path = self.output_dir / img_path.name
+            watermarked.save(output_path, quality=95)
+    
+    def _watermark_layer(self, size, text, position, opacity):
+        """Build the watermark for an image size, cropped to the text and clipped to the image"""
+        key = (size, text, position, opacity)
+        if key in self._watermark_cache:
+            return self._watermark_cache[key]
+        
+        width, height = size
+        
+        font_size = max(20, height // 30)
+        font = self._get_font(font_size)
+        
+        # Get text bounding box, covering every line of multi-line text
+        bbox = self._text_bbox_cache.get((font_size, text))
+        if bbox is None:
+            draw = ImageDraw.Draw(Image.new('L', (1, 1)))
+            bbox = self._text_bbox_cache[(font_size, text)] = draw.multiline_textbbox((0, 0), text, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        
+        # Calculate position
+        margin = 10
+        if position == 'bottom-right':
+            x = width - text_width - margin
+            y = height - text_height - margin
+        elif position == 'bottom-left':
+            x = margin
+            y = height - text_height - margin
+        elif position == 'top-right':
+            x = width - text_width - margin
+            y = margin
+        elif position == 'top-left':
+            x = margin
+            y = margin
+        elif position == 'center':
+            x = (width - text_width) // 2
+            y = (height - text_height) // 2
+        else:
+            x = width - text_width - margin
+            y = height - text_height - margin
+        
+        # Clip the text's ink box to the image
+        left, top = max(0, x + bbox[0]), max(0, y + bbox[1])
+        right, bottom = min(width, x + bbox[2]), min(height, y + bbox[3])
+        
+        watermark = None
+        if right > left and bottom > top:
+            # Draw text with semi-transparency, offset so the layer starts at (left, top)
+            layer = Image.new('RGBA', (right - left, bottom - top), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(layer)
+            draw.text((x - left, y - top), text, fill=(255, 255, 255, opacity), font=font)
+            watermark = (layer, (left, top))
+        
+        self._watermark_cache[key] = watermark
+        return watermark
+    
+    def _get_font(self, font_size):
+        """Load the watermark font at a size, once per size"""
+        font = self._font_cache.get(font_size)
+        if font is None:
+            # Try to use a nice font, fall back to default
+            try:
+                font = ImageFont.truetype("arial.ttf", font_size)
+            except:
+                font = ImageFont.load_default()
+            self._font_cache[font_size] = font
+        return font
     
     def _format_size(self, size):
         """Format file size in human-readable format"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024.0:
-                return f"{size:.2f} {unit}"
-            size /= 1024.0
-        return f"{size:.2f} TB"
+        if size < 1024:
+            return f"{size:.2f} B"
+        # Each unit is ten more bits, so the bit length picks it without a division loop
+        unit = min((int(size).bit_length() - 1) // 10, len(SIZE_UNITS) - 1)
+        return f"{size / (1 << (10 * unit)):.2f} {SIZE_UNITS[unit]}"
 
 
 def main():
@@ -294,7 +428,8 @@ Examples:
     
     # Compress options
     parser.add_argument('--compress', type=int, metavar='QUALITY',
-                       help='Compress images (quality 1-100, default: 85)')
+                       help='Compress images (quality 1-100, default: 85); JPEGs already at or '
+                            'below QUALITY keep their own quantization')
     
     # Watermark options
     parser.add_argument('--watermark', metavar='TEXT', help='Add text watermark')
@@ -303,10 +438,12 @@ Examples:
                        default='bottom-right', help='Watermark position')
     parser.add_argument('--opacity', type=int, default=128,
                        help='Watermark opacity (0-255, default: 128)')
+    parser.add_argument('--max-concurrency', type=int, metavar='N',
+                       help='Maximum number of images to process in parallel')
     
     args = parser.parse_args()
     
-    processor = ImageProcessor(args.input_dir, args.output)
+    processor = ImageProcessor(args.input_dir, args.output, args.max_concurrency)
     
     # Process images based on options
     if args.resize:
@@ -7,30 +7,75 @@ Requires: pip install psutil
 
 import psutil
 import argparse
+import heapq
+import io
+import shutil
+import signal
+import sys
+import threading
 import time
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
 import json
 import os
 
+# Cursor home, clear screen and scrollback: what `clear` prints, without the fork
+CLEAR_SCREEN = '\x1b[H\x1b[2J\x1b[3J'
+
+# Usage bars up to the full 50 blocks, built once
+BARS = ['█' * i for i in range(51)]
+
+# Alerts kept in memory for callers; every alert is also streamed to the log file
+RECENT_ALERTS = 100
+
+# Size units in steps of 1024
+BYTE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
+# Totals and capacities repeat every frame, so keep their formatted strings
+@lru_cache(maxsize=4096)
+def format_bytes(bytes_value):
+    """Format bytes to human-readable format"""
+    if bytes_value < 1024:
+        return f"{bytes_value:.2f} B"
+    # 1024 is 2**10, so every ten bits of the value is one unit up
+    unit = min((int(bytes_value).bit_length() - 1) // 10, len(BYTE_UNITS) - 1)
+    return f"{bytes_value / (1 << (10 * unit)):.2f} {BYTE_UNITS[unit]}"
+
 class SystemMonitor:
     def __init__(self, alert_cpu=90, alert_memory=90, alert_disk=90):
         self.alert_cpu = alert_cpu
         self.alert_memory = alert_memory
         self.alert_disk = alert_disk
         self.alerts_triggered = []
+        self.alerts_count = 0
         self.log_file = 'system_monitor.log'
+        self._log_fh = None
+        
+        # Terminals get the ANSI clear directly; anything else keeps the clear command
+        self._ansi_clear = sys.stdout.isatty()
+        if self._ansi_clear and os.name == 'nt':
+            os.system('')  # Turns on escape sequence processing in the Windows console
+        
+        # Terminal width; while monitoring, SIGWINCH refreshes it instead of a query per frame
+        self._cols = shutil.get_terminal_size().columns
+        self._watching_resize = False
+        
+        # psutil measures CPU usage from its previous sample; until one exists, block for it
+        self._cpu_sampled = False
     
     def get_cpu_info(self):
-        """Get CPU usage information"""
-        cpu_percent = psutil.cpu_percent(interval=1)
+        """Get CPU usage information (since the last sample, or over one second for the first)"""
+        per_cpu = psutil.cpu_percent(interval=None if self._cpu_sampled else 1, percpu=True)
+        self._cpu_sampled = True
         cpu_count = psutil.cpu_count()
         cpu_freq = psutil.cpu_freq()
         
         return {
-            'usage_percent': cpu_percent,
+            'usage_percent': sum(per_cpu) / len(per_cpu),
             'cores': cpu_count,
             'frequency': cpu_freq.current if cpu_freq else 0,
-            'per_cpu': psutil.cpu_percent(interval=0, percpu=True)
+            'per_cpu': per_cpu
         }
     
     def get_memory_info(self):
@@ -54,15 +99,27 @@ class SystemMonitor:
         
         for partition in psutil.disk_partitions():
             try:
-                usage = psutil.disk_usage(partition.mountpoint)
+                if hasattr(os, 'statvfs'):
+                    # Same figures psutil.disk_usage derives, straight from one statvfs call
+                    st = os.statvfs(partition.mountpoint)
+                    total = st.f_blocks * st.f_frsize
+                    used = (st.f_blocks - st.f_bfree) * st.f_frsize
+                    free = st.f_bavail * st.f_frsize
+                    # Percent of the space available to users, as psutil reports it
+                    user_total = used + free
+                    percent = round(used / user_total * 100, 1) if user_total else 0.0
+                else:
+                    usage = psutil.disk_usage(partition.mountpoint)
+                    total, used, free, percent = usage.total, usage.used, usage.free, usage.percent
+                
                 disks.append({
                     'device': partition.device,
                     'mountpoint': partition.mountpoint,
                     'fstype': partition.fstype,
-                    'total': usage.total,
-                    'used': usage.used,
-                    'free': usage.free,
-                    'percent': usage.percent
+                    'total': total,
+                    'used': used,
+                    'free': free,
+                    'percent': percent
                 })
             except PermissionError:
                 continue
@@ -82,19 +139,21 @@ class SystemMonitor:
     
     def get_process_info(self, limit=10):
         """Get top processes by CPU and memory usage"""
+        # (cpu, memory, info) per process so the top-k keys are plain tuple lookups
         processes = []
         
         for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
             try:
-                processes.append(proc.info)
+                info = proc.info
+                processes.append((info['cpu_percent'] or 0, info['memory_percent'] or 0, info))
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 pass
         
-        # Sort by CPU usage
-        top_cpu = sorted(processes, key=lambda x: x['cpu_percent'] or 0, reverse=True)[:limit]
+        # Top processes by CPU usage
+        top_cpu = [entry[2] for entry in heapq.nlargest(limit, processes, key=itemgetter(0))]
         
-        # Sort by memory usage
-        top_memory = sorted(processes, key=lambda x: x['memory_percent'] or 0, reverse=True)[:limit]
+        # Top processes by memory usage
+        top_memory = [entry[2] for entry in heapq.nlargest(limit, processes, key=itemgetter(1))]
         
         return {
             'top_cpu': top_cpu,
@@ -104,7 +163,7 @@ class SystemMonitor:
     
     def check_alerts(self, cpu_info, memory_info, disk_info):
         """Check if any alerts should be triggered"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
         alerts = []
         
         # CPU alert
@@ -127,89 +186,110 @@ class SystemMonitor:
     
     def display_dashboard(self):
         """Display system monitoring dashboard"""
+        # Build the whole frame and write it at once so the redraw doesn't tear
+        out = io.StringIO()
+        
+        # Bars shrink to fit narrow terminals, up to 50 blocks
+        if not self._watching_resize:
+            self._cols = shutil.get_terminal_size().columns
+        bar_width = max(10, min(50, self._cols - 20))
+        
         # Clear screen (cross-platform)
-        os.system('cls' if os.name == 'nt' else 'clear')
+        if self._ansi_clear:
+            out.write(CLEAR_SCREEN)
+        else:
+            os.system('cls' if os.name == 'nt' else 'clear')
         
-        print("="*80)
-        print("🖥️  SYSTEM MONITOR DASHBOARD")
-        print("="*80)
-        print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        print("="*80, file=out)
+        print("🖥️  SYSTEM MONITOR DASHBOARD", file=out)
+        print("="*80, file=out)
+        print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n", file=out)
         
         # CPU Information
         cpu_info = self.get_cpu_info()
-        print("🔥 CPU")
-        print("-" * 80)
-        print(f"Overall Usage: {cpu_info['usage_percent']:.1f}%")
-        print(f"Cores: {cpu_info['cores']}")
-        print(f"Frequency: {cpu_info['frequency']:.2f} MHz")
+        print("🔥 CPU", file=out)
+        print("-" * 80, file=out)
+        print(f"Overall Usage: {cpu_info['usage_percent']:.1f}%", file=out)
+        print(f"Cores: {cpu_info['cores']}", file=out)
+        print(f"Frequency: {cpu_info['frequency']:.2f} MHz", file=out)
         
         # Show per-core usage
-        print("Per-Core Usage:")
-        for i, usage in enumerate(cpu_info['per_cpu']):
-            bar = '█' * int(usage / 2)
-            print(f"  Core {i}: {usage:>5.1f}% {bar}")
+        print("Per-Core Usage:", file=out)
+        out.write(''.join(f"  Core {i}: {usage:>5.1f}% {self._bar(usage, bar_width)}\n"
+                          for i, usage in enumerate(cpu_info['per_cpu'])))
         
         # Memory Information
         memory_info = self.get_memory_info()
-        print(f"\n💾 MEMORY")
-        print("-" * 80)
-        print(f"Total: {self._format_bytes(memory_info['total'])}")
-        print(f"Used: {self._format_bytes(memory_info['used'])} ({memory_info['percent']:.1f}%)")
-        print(f"Available: {self._format_bytes(memory_info['available'])}")
+        print(f"\n💾 MEMORY", file=out)
+        print("-" * 80, file=out)
+        print(f"Total: {self._format_bytes(memory_info['total'])}", file=out)
+        print(f"Used: {self._format_bytes(memory_info['used'])} ({memory_info['percent']:.1f}%)", file=out)
+        print(f"Available: {self._format_bytes(memory_info['available'])}", file=out)
         
-        memory_bar = '█' * int(memory_info['percent'] / 2)
-        print(f"Usage: [{memory_bar:<50}] {memory_info['percent']:.1f}%")
+        memory_bar = self._bar(memory_info['percent'], bar_width)
+        print(f"Usage: [{memory_bar:<{bar_width}}] {memory_info['percent']:.1f}%", file=out)
         
         if memory_info['swap_total'] > 0:
             print(f"\nSwap: {self._format_bytes(memory_info['swap_used'])} / "
-                  f"{self._format_bytes(memory_info['swap_total'])} ({memory_info['swap_percent']:.1f}%)")
+                  f"{self._format_bytes(memory_info['swap_total'])} ({memory_info['swap_percent']:.1f}%)", file=out)
             # Disk Information
         disk_info = self.get_disk_info()
-        print(f"\n💿 DISK")
-        print("-" * 80)
+        print(f"\n💿 DISK", file=out)
+        print("-" * 80, file=out)
         for disk in disk_info:
-            print(f"{disk['mountpoint']} ({disk['fstype']})")
-            print(f"  Total: {self._format_bytes(disk['total'])}")
-            print(f"  Used: {self._format_bytes(disk['used'])} ({disk['percent']:.1f}%)")
-            print(f"  Free: {self._format_bytes(disk['free'])}")
+            print(f"{disk['mountpoint']} ({disk['fstype']})", file=out)
+            print(f"  Total: {self._format_bytes(disk['total'])}", file=out)
+            print(f"  Used: {self._format_bytes(disk['used'])} ({disk['percent']:.1f}%)", file=out)
+            print(f"  Free: {self._format_bytes(disk['free'])}", file=out)
             
-            disk_bar = '█' * int(disk['percent'] / 2)
-            print(f"  [{disk_bar:<50}] {disk['percent']:.1f}%\n")
+            disk_bar = self._bar(disk['percent'], bar_width)
+            print(f"  [{disk_bar:<{bar_width}}] {disk['percent']:.1f}%\n", file=out)
         
         # Network Information
         network_info = self.get_network_info()
-        print(f"🌐 NETWORK")
-        print("-" * 80)
-        print(f"Sent: {self._format_bytes(network_info['bytes_sent'])}")
-        print(f"Received: {self._format_bytes(network_info['bytes_recv'])}")
-        print(f"Packets Sent: {network_info['packets_sent']:,}")
-        print(f"Packets Received: {network_info['packets_recv']:,}")
+        print(f"🌐 NETWORK", file=out)
+        print("-" * 80, file=out)
+        print(f"Sent: {self._format_bytes(network_info['bytes_sent'])}", file=out)
+        print(f"Received: {self._format_bytes(network_info['bytes_recv'])}", file=out)
+        print(f"Packets Sent: {network_info['packets_sent']:,}", file=out)
+        print(f"Packets Received: {network_info['packets_recv']:,}", file=out)
         
         # Process Information
         process_info = self.get_process_info(5)
-        print(f"\n⚙️  TOP PROCESSES")
-        print("-" * 80)
-        print("By CPU:")
+        print(f"\n⚙️  TOP PROCESSES", file=out)
+        print("-" * 80, file=out)
+        print("By CPU:", file=out)
         for proc in process_info['top_cpu'][:5]:
             cpu = proc['cpu_percent'] or 0
-            print(f"  {proc['name']:<30} PID: {proc['pid']:<8} CPU: {cpu:>5.1f}%")
+            print(f"  {proc['name']:<30} PID: {proc['pid']:<8} CPU: {cpu:>5.1f}%", file=out)
         
-        print("\nBy Memory:")
+        print("\nBy Memory:", file=out)
         for proc in process_info['top_memory'][:5]:
             mem = proc['memory_percent'] or 0
-            print(f"  {proc['name']:<30} PID: {proc['pid']:<8} MEM: {mem:>5.1f}%")
+            print(f"  {proc['name']:<30} PID: {proc['pid']:<8} MEM: {mem:>5.1f}%", file=out)
         
         # Check for alerts
         alerts = self.check_alerts(cpu_info, memory_info, disk_info)
         if alerts:
-            print(f"\n🚨 ALERTS")
-            print("-" * 80)
+            print(f"\n🚨 ALERTS", file=out)
+            print("-" * 80, file=out)
             for alert in alerts:
-                print(alert)
-                self.alerts_triggered.append(alert)
+                print(alert, file=out)
+                self._log_alert(alert)
         
-        print("\n" + "="*80)
-        print("Press Ctrl+C to stop monitoring")
+        print("\n" + "="*80, file=out)
+        print("Press Ctrl+C to stop monitoring", file=out)
+        
+        sys.stdout.write(out.getvalue())
+        sys.stdout.flush()
+    
+    def _bar(self, percent, width):
+        """Usage bar for a percentage, scaled to width blocks"""
+        return BARS[min(width, int(percent * width / 100))]
+    
+    def _on_resize(self, signum, frame):
+        """Pick up the new terminal width after a resize"""
+        self._cols = shutil.get_terminal_size().columns
     
     def monitor_continuous(self, interval=2):
         """Continuously monitor system and display dashboard"""
@@ -217,6 +297,14 @@ class SystemMonitor:
         print(f"Update interval: {interval} seconds")
         print(f"Alert thresholds - CPU: {self.alert_cpu}%, Memory: {self.alert_memory}%, Disk: {self.alert_disk}%\n")
         
+        # Signal handlers can only be set from the main thread
+        previous_handler = None
+        if hasattr(signal, 'SIGWINCH') and threading.current_thread() is threading.main_thread():
+            previous_handler = signal.getsignal(signal.SIGWINCH)
+            signal.signal(signal.SIGWINCH, self._on_resize)
+            self._cols = shutil.get_terminal_size().columns
+            self._watching_resize = True
+        
         try:
             while True:
                 self.display_dashboard()
@@ -224,20 +312,42 @@ class SystemMonitor:
         except KeyboardInterrupt:
             print("\n\n👋 Monitoring stopped.")
             
-            if self.alerts_triggered:
-                print(f"\n📊 Total alerts triggered: {len(self.alerts_triggered)}")
+            if self.alerts_count:
+                print(f"\n📊 Total alerts triggered: {self.alerts_count}")
                 self.save_alerts_log()
+        finally:
+            if self._watching_resize:
+                signal.signal(signal.SIGWINCH, previous_handler)
+                self._watching_resize = False
+            if self._log_fh:
+                self._log_fh.close()
+                self._log_fh = None
     
     def save_alerts_log(self):
         """Save triggered alerts to log file"""
+        # Alerts are already written as they trigger; just push out anything buffered
         try:
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                for alert in self.alerts_triggered:
-                    f.write(alert + '\n')
+            if self._log_fh:
+                self._log_fh.flush()
             print(f"💾 Alerts saved to: {self.log_file}")
         except Exception as e:
             print(f"❌ Error saving log: {e}")
     
+    def _log_alert(self, alert):
+        """Record an alert and append it to the log file as soon as it triggers"""
+        self.alerts_count += 1
+        self.alerts_triggered.append(alert)
+        # Trim in batches so the list stays bounded without a copy per alert
+        if len(self.alerts_triggered) > 2 * RECENT_ALERTS:
+            del self.alerts_triggered[:-RECENT_ALERTS]
+        
+        try:
+            if self._log_fh is None:
+                self._log_fh = open(self.log_file, 'a', buffering=1, encoding='utf-8')
+            self._log_fh.write(alert + '\n')
+        except Exception as e:
+            print(f"❌ Error saving log: {e}")
+    
     def generate_report(self, output_file='system_report.json'):
         """Generate a system report"""
         report = {
@@ -258,11 +368,7 @@ class SystemMonitor:
     
     def _format_bytes(self, bytes_value):
         """Format bytes to human-readable format"""
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if bytes_value < 1024.0:
-                return f"{bytes_value:.2f} {unit}"
-            bytes_value /= 1024.0
-        return f"{bytes_value:.2f} PB"
+        return format_bytes(bytes_value)
 
 
 def main():